@@ -4,20 +4,46 @@
 # Standard library imports
 import os
 import sys
-import uuid
+import secrets
 import re
 import json
 import traceback
 import zipfile
-from xml.etree import ElementTree as ET
+import io
+import asyncio
+import hashlib
+import tempfile
+import contextlib
+import concurrent.futures
+# XML parser: lxml when installed (faster, releases the GIL), else the C-accelerated ElementTree
+try:
+    from lxml.etree import iterparse, XMLSyntaxError as ParseError
+    # Never expand external entities or fetch DTDs from uploaded XML
+    ITERPARSE_KWARGS = {"resolve_entities": False, "no_network": True}
+except ImportError:
+    try:
+        from xml.etree.cElementTree import iterparse, ParseError
+    except ImportError:
+        from xml.etree.ElementTree import iterparse, ParseError
+    ITERPARSE_KWARGS = {}
 from test import *
 
+# Optional SIMD deflate/crc32 for the dbt project zip (pip install zlib-ng)
+try:
+    from zlib_ng import zlib_ng
+    # zipfile binds crc32 at import time, so swapping the module alone only changes deflate
+    zipfile.zlib = zlib_ng
+    zipfile.crc32 = zlib_ng.crc32
+except ImportError:
+    pass
+
 # Third-party imports
 from dotenv import load_dotenv
-from flask import Flask, request, jsonify, send_from_directory
+from quart import Quart, Response, request, jsonify, send_from_directory
+from quart_cors import cors
 from werkzeug.utils import secure_filename
-from flask_cors import CORS
 import google.generativeai as genai
+import orjson
 
 # ==============================================================================
 # Configuration & Initialization
@@ -48,27 +74,100 @@ print(f"Using Generative Model: {MODEL_NAME}")
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 UPLOAD_DIR = os.path.join(BASE_DIR, "uploads")
 RESULTS_DIR = os.path.join(BASE_DIR, "results")
-for d in (UPLOAD_DIR, RESULTS_DIR):
+CACHE_DIR = os.path.join(RESULTS_DIR, "_cache")
+for d in (UPLOAD_DIR, RESULTS_DIR, CACHE_DIR):
     os.makedirs(d, exist_ok=True)
 print(f"Uploads directory: {UPLOAD_DIR}")
 print(f"Results directory: {RESULTS_DIR}")
 
-# Flask Application Setup
-app = Flask(__name__, static_folder=BASE_DIR, static_url_path="")
-CORS(app)
+# Quart Application Setup (ASGI; serve with `hypercorn app1:app --workers 2 --worker-class asyncio`)
+app = cors(Quart(__name__, static_folder=BASE_DIR, static_url_path=""))
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16 MB
-print("Flask app initialized with CORS enabled.")
+app.config['RESPONSE_TIMEOUT'] = 600  # streamed conversions can outlast the 60 s default
+print("Quart app initialized with CORS enabled.")
 
 # ==============================================================================
 # Helper Functions
 # ==============================================================================
 
+# GenerativeModel instances, built once per model name and reused across requests
+_MODELS = {}
+
+def get_generative_model(model_name=MODEL_NAME):
+    """Return the cached GenerativeModel for model_name, creating it on first use."""
+    model = _MODELS.get(model_name)
+    if model is None:
+        model = genai.GenerativeModel(model_name=model_name)
+        _MODELS[model_name] = model
+    return model
+
+# Components sent to the model per prompt, and how many prompts may be in flight
+COMPONENT_BATCH_SIZE = 8
+MAX_CONCURRENT_LLM_CALLS = 8
+# Shared by every request in the process (not bound to a loop until first use)
+LLM_SEMAPHORE = asyncio.Semaphore(MAX_CONCURRENT_LLM_CALLS)
+
+# Structured output for /convert: the model returns {"models": [{"name", "sql"}]} as JSON
+CONVERSION_GENERATION_CONFIG = {
+    "response_mime_type": "application/json",
+    "response_schema": {
+        "type": "object",
+        "properties": {
+            "models": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "name": {"type": "string"},
+                        "sql": {"type": "string"}
+                    }
+                }
+            }
+        }
+    },
+    "max_output_tokens": 8192
+}
+
+# Small pool for cache and result-file I/O, kept off the event loop
+IO_EXECUTOR = concurrent.futures.ThreadPoolExecutor(max_workers=4, thread_name_prefix="io")
+
+# Basic dbt_project.yml shipped in every generated project
+DBT_PROJECT_YML = """
+name: 'talend_converted_project'
+version: '1.0.0'
+config-version: 2
+profile: 'default'
+model-paths: ["models"]
+    """
+
+# Fenced code blocks (```sql ... ```) in the model output
+FENCE_RE = re.compile(r"```(?:sql)?\n(.*?)\n```", re.DOTALL)
+# `<<<MODEL i>>>` delimiter lines the fenced prompts put before each model
+MODEL_MARKER_RE = re.compile(r"^<<<MODEL \d+>>>$", re.MULTILINE)
+
+# Parameters that carry no conversion value and are left out of the summary
+PARAM_SKIP = frozenset([
+    "UNIQUE_NAME", "COMPONENT_NAME", "LABEL", "CONNECTION_FORMAT",
+    "CHECK_NUM", "CHECK_UNIQUE_NAME", "ACTIVATE", "LOG4J_ACTIVATE",
+    "START", "STARTABLE", "SUBTREE_START", "END_OF_FLOW",
+    "PROCESS_TYPE_VERSION", "PROCESS_TYPE_CONTEXT", "PROCESS_TYPE_PROCESS",
+    "QUERYSTORE", "UPDATE_COMPONENTS", "CURRENT_OS"
+])
+
+def local_name(tag):
+    """Strip the '{namespace}' prefix from an element tag."""
+    return tag.rpartition('}')[2]
+
 def parse_talend_xml(xml_content):
     """
     Parse Talend XML (.item file) to extract components, connections, metadata, and notes.
+
+    The document is read in a single streaming pass with iterparse; each
+    <node>, <connection> and <note> is cleared once it has been handled.
     
     Args:
-        xml_content (str): Content of the Talend XML file.
+        xml_content (bytes | str | file): Content of the Talend XML file, or a
+            binary file object such as an upload's stream.
     
     Returns:
         dict: Summary of job structure or error details.
@@ -82,101 +181,49 @@ def parse_talend_xml(xml_content):
     }
     print("Starting XML parsing...")
     try:
-        namespaces = {
-            'TalendProperties': 'http://www.talend.org/properties',
-            'xmi': 'http://www.omg.org/XMI',
-            'talendfile': 'platform:/resource/org.talend.model/model/TalendFile.xsd',
-        }
-        root = ET.fromstring(xml_content)
-        print("XML root element parsed.")
+        if isinstance(xml_content, str):
+            xml_content = xml_content.encode("utf-8")
+        source = io.BytesIO(xml_content) if isinstance(xml_content, bytes) else xml_content
+        property_label = None
+        process_type_name = None
+
+        for _, elem in iterparse(source, events=("end",), **ITERPARSE_KWARGS):
+            tag = local_name(elem.tag)
+
+            # Extract Components
+            if tag == 'node':
+                summary["components"].append(_parse_component(elem, summary["metadata"]))
+                elem.clear()
+
+            # Extract Connections
+            elif tag == 'connection':
+                summary["connections"].append({
+                    "source_component_id": elem.get('source'), "target_component_id": elem.get('target'),
+                    "connector_name": elem.get('connectorName'), "line_style": elem.get('lineStyle'),
+                    "metadata_name": elem.get('metaname')
+                })
+                elem.clear()
 
-        # Extract Job Name
-        job_info = root.find('.//TalendProperties:Property', namespaces=namespaces)
-        if job_info is not None and job_info.get("label"):
-            summary["job_name"] = job_info.get("label")
-        else:
-            process_type = root.find('.//processType')
-            if process_type is not None and process_type.get("name"):
-                summary["job_name"] = process_type.get("name")
-        print(f"Found job name: {summary['job_name']}")
+            # Extract Notes
+            elif tag == 'note':
+                summary["notes"].append(elem.get('text'))
+                elem.clear()
 
-        # Extract Components
-        for node in root.findall('.//node'):
-            component_name = node.get('componentName')
-            unique_name = node.get('uniqueName')
-            label = unique_name
-            params = {}
-            for param in node.findall('.//elementParameter'):
-                field = param.get('field')
-                name = param.get('name')
-                value = param.text if param.text is not None else param.get('value')
-                if value is not None and field and name and name not in [
-                    "UNIQUE_NAME", "COMPONENT_NAME", "LABEL", "CONNECTION_FORMAT",
-                    "CHECK_NUM", "CHECK_UNIQUE_NAME", "ACTIVATE", "LOG4J_ACTIVATE",
-                    "START", "STARTABLE", "SUBTREE_START", "END_OF_FLOW", "ACTIVATE",
-                    "PROCESS_TYPE_VERSION", "PROCESS_TYPE_CONTEXT", "PROCESS_TYPE_PROCESS",
-                    "QUERYSTORE", "UPDATE_COMPONENTS", "CURRENT_OS"
-                ]:
-                    cleaned_value = value.strip('"') if isinstance(value, str) else value
-                    params[name] = cleaned_value
-                if component_name == 'tMap':
-                    if name == 'VAR_TABLE': params['tMap_variables_raw'] = value
-                    if name == 'OUTPUT_TABLES': params['tMap_outputs_raw'] = value
-                elif name == 'QUERY' and value:
-                    params['sql_query'] = value.strip('"') if isinstance(value, str) else value
-                elif name == 'FILENAME' and value:
-                    params['filepath'] = value.strip('"') if isinstance(value, str) else value
-                elif name == 'TABLE' and value:
-                    params['db_table_name'] = value.strip('"') if isinstance(value, str) else value
-
-            label_param = node.find('.//elementParameter[@name="LABEL"]')
-            if label_param is not None and label_param.get('value'):
-                label = label_param.get('value').strip('"')
-            hint_param = node.find('.//elementParameter[@name="HINT"]')
-            if hint_param is not None and hint_param.get('value'):
-                params["hint"] = hint_param.get('value').strip('"')
-
-            component_data = {
-                "type": component_name, "unique_name": unique_name, "label": label,
-                "parameters": params, "metadata": []
-            }
+            # Job Name candidates
+            elif tag == 'Property' and property_label is None and elem.get("label"):
+                property_label = elem.get("label")
+            elif tag == 'processType' and process_type_name is None and elem.get("name"):
+                process_type_name = elem.get("name")
 
-            for meta_conn in node.findall('.//metadata'):
-                connector_name = meta_conn.get('connector')
-                meta_name = meta_conn.get('name')
-                columns = []
-                for col in meta_conn.findall('.//column'):
-                    col_data = {
-                        "name": col.get('name'), "talend_type": col.get('type'),
-                        "key": col.get('key', 'false') == 'true',
-                        "nullable": col.get('nullable', 'true') == 'true',
-                        "length": col.get('length'), "precision": col.get('precision'),
-                        "comment": col.get('comment')
-                    }
-                    default_val = col.get('defaultValue')
-                    if default_val: col_data['default'] = default_val.strip('"')
-                    columns.append(col_data)
-                component_data["metadata"].append({
-                    "connector_type": connector_name, "name": meta_name, "columns": columns
-                })
-                if meta_name and meta_name not in summary["metadata"]:
-                    summary["metadata"][meta_name] = {"columns": columns}
-            summary["components"].append(component_data)
-
-        # Extract Connections
-        for conn in root.findall('.//connection'):
-            summary["connections"].append({
-                "source_component_id": conn.get('source'), "target_component_id": conn.get('target'),
-                "connector_name": conn.get('connectorName'), "line_style": conn.get('lineStyle'),
-                "metadata_name": conn.get('metaname')
-            })
-
-        # Extract Notes
-        for note in root.findall('.//note'):
-            summary["notes"].append(note.get('text'))
+        print("XML root element parsed.")
+        if property_label:
+            summary["job_name"] = property_label
+        elif process_type_name:
+            summary["job_name"] = process_type_name
+        print(f"Found job name: {summary['job_name']}")
         print("XML parsing finished successfully.")
 
-    except ET.ParseError as e:
+    except ParseError as e:
         print(f"XML Parsing Error: {e}", file=sys.stderr)
         summary["error"] = f"Failed to parse XML: {e}"
     except Exception as e:
@@ -184,111 +231,453 @@ def parse_talend_xml(xml_content):
         summary["error"] = f"Unexpected error during XML parsing: {e}"
     return summary
 
-def call_generative_model(prompt, model_name=MODEL_NAME):
+def _parse_component(node, summary_metadata):
+    """
+    Build the component entry for a single <node> element.
+
+    Args:
+        node (Element): The fully parsed <node> element.
+        summary_metadata (dict): Job-level metadata map, updated in place.
+
+    Returns:
+        dict: Component type, names, parameters and metadata.
+    """
+    component_name = node.get('componentName')
+    unique_name = node.get('uniqueName')
+    label = unique_name
+    params = {}
+    for param in node.iterfind('elementParameter'):
+        field = param.get('field')
+        name = param.get('name')
+        value = param.text if param.text is not None else param.get('value')
+        if name == 'LABEL' and param.get('value'):
+            label = param.get('value').strip('"')
+        elif name == 'HINT' and param.get('value'):
+            params["hint"] = param.get('value').strip('"')
+        if value is not None and field and name and name not in PARAM_SKIP:
+            cleaned_value = value.strip('"') if isinstance(value, str) else value
+            params[name] = cleaned_value
+        if component_name == 'tMap':
+            if name == 'VAR_TABLE': params['tMap_variables_raw'] = value
+            if name == 'OUTPUT_TABLES': params['tMap_outputs_raw'] = value
+        elif name == 'QUERY' and value:
+            params['sql_query'] = value.strip('"') if isinstance(value, str) else value
+        elif name == 'FILENAME' and value:
+            params['filepath'] = value.strip('"') if isinstance(value, str) else value
+        elif name == 'TABLE' and value:
+            params['db_table_name'] = value.strip('"') if isinstance(value, str) else value
+
+    component_data = {
+        "type": component_name, "unique_name": unique_name, "label": label,
+        "parameters": params, "metadata": []
+    }
+
+    for meta_conn in node.iter('metadata'):
+        connector_name = meta_conn.get('connector')
+        meta_name = meta_conn.get('name')
+        columns = []
+        for col in meta_conn.iter('column'):
+            col_data = {
+                "name": col.get('name'), "talend_type": col.get('type'),
+                "key": col.get('key', 'false') == 'true',
+                "nullable": col.get('nullable', 'true') == 'true',
+                "length": col.get('length'), "precision": col.get('precision'),
+                "comment": col.get('comment')
+            }
+            default_val = col.get('defaultValue')
+            if default_val: col_data['default'] = default_val.strip('"')
+            columns.append(col_data)
+        component_data["metadata"].append({
+            "connector_type": connector_name, "name": meta_name, "columns": columns
+        })
+        if meta_name and meta_name not in summary_metadata:
+            summary_metadata[meta_name] = {"columns": columns}
+    return component_data
+
+def build_conversion_prompts(talend_summary, structured_output=False):
+    """
+    Build the conversion prompts, one per batch of COMPONENT_BATCH_SIZE components.
+    
+    Args:
+        talend_summary (dict): Parsed Talend job.
+        structured_output (bool): Ask for CONVERSION_GENERATION_CONFIG JSON instead of fenced SQL.
+    
+    Returns:
+        list: Prompt strings, in component order.
+    """
+    components = talend_summary.get("components", [])
+    batches = [components[i:i + COMPONENT_BATCH_SIZE]
+               for i in range(0, len(components), COMPONENT_BATCH_SIZE)] or [[]]
+    prompts = []
+    for batch_no, batch in enumerate(batches):
+        first_index = batch_no * COMPONENT_BATCH_SIZE + 1
+        batch_summary = {k: v for k, v in talend_summary.items() if k != "components"}
+        batch_summary["components"] = [
+            {"model_index": first_index + i, **component} for i, component in enumerate(batch)
+        ]
+        # The zip ships DBT_PROJECT_YML, so the model never writes its own
+        project_instruction = "Do not generate a `dbt_project.yml` file; it is generated separately."
+        if structured_output:
+            output_instruction = ("Return a JSON object whose `models` array has one entry per dbt model, "
+                                  "with the model `name` and its complete `sql`.")
+        else:
+            output_instruction = ("Precede each model with a line `<<<MODEL i>>>`, where i is the `model_index` "
+                                  "of the component it is built from, followed by its SQL code block marked by ```sql\n...\n```.")
+        scope_note = (
+            f"The json lists the whole job's connections but only components "
+            f"{first_index} to {first_index + len(batch) - 1} of {len(components)}.\n"
+        ) if len(batches) > 1 else ""
+        prompts.append(f"""
+you are an expert data engineer who is excel at migrating talend to DBT from json. parsed json into corresponding dbt models (SQL and YAML configuration). Use the parsed json if available, otherwise analyze the raw XML.
+{scope_note}jsonfile:
+```json
+{orjson.dumps(batch_summary, option=orjson.OPT_INDENT_2).decode()}
+```
+**Instructions:**
+1. Generate dbt SQL models (.sql files) for the listed components based on the Talend job logic.
+2. {project_instruction}
+3. Provide detailed comments in the SQL files.
+4. Handle tMap components by converting mappings to SQL transformations.
+5. {output_instruction}
+""")
+    return prompts
+
+def finish_reason_name(candidate):
+    """Name of the candidate's finish reason, e.g. 'STOP' or 'MAX_TOKENS'."""
+    reason = getattr(candidate, "finish_reason", None)
+    return getattr(reason, "name", str(reason))
+
+async def call_generative_model(prompt, model_name=MODEL_NAME, generation_config=None):
     """
     Call the generative model with the provided prompt.
     
     Args:
         prompt (str): The prompt to send to the model.
         model_name (str): The model to use.
+        generation_config (dict): Optional generation settings (output format, token limit).
     
     Returns:
         str: Generated text or error message.
     """
     print(f"Calling Generative Model ({model_name})...")
     try:
-        model = genai.GenerativeModel(model_name=model_name)
-        response = model.generate_content(prompt)
+        model = get_generative_model(model_name)
+        async with LLM_SEMAPHORE:
+            response = await model.generate_content_async(prompt, generation_config=generation_config)
         if not response.candidates:
             return f"-- ERROR: Content generation failed (prompt blocked?)."
         candidate = response.candidates[0]
         if not candidate.content or not candidate.content.parts:
             return f"-- ERROR: No content generated."
+        reason = finish_reason_name(candidate)
+        if reason != "STOP":
+            # Truncated (MAX_TOKENS) or filtered output is incomplete; never use it as SQL
+            return f"-- ERROR: Generation stopped early (finish reason: {reason})."
         return candidate.content.parts[0].text
     except Exception as e:
         print(f"Error calling Generative Model: {e}", file=sys.stderr)
         return f"-- ERROR: Failed to generate content: {e}"
 
-def create_dbt_project_files(job_id, safe_filename, dbt_content):
+def prompt_cache_path(prompt, generation_config=None):
+    """Path of the cached response, keyed by a BLAKE2b hash of model, generation config and prompt."""
+    config = orjson.dumps(generation_config, option=orjson.OPT_SORT_KEYS)
+    key = hashlib.blake2b(f"{MODEL_NAME}\n".encode("utf-8") + config + f"\n{prompt}".encode("utf-8"),
+                          digest_size=16).hexdigest()
+    return os.path.join(CACHE_DIR, f"{key}.txt")
+
+def load_cached_response(prompt, generation_config=None):
+    """Return the cached response for prompt, or None on a cache miss."""
+    try:
+        with open(prompt_cache_path(prompt, generation_config), "r", encoding="utf-8") as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+def store_cached_response(prompt, text, generation_config=None):
+    """
+    Atomically write a response to the prompt cache.
+
+    Only complete responses are passed in (truncated or filtered generations
+    come back as '-- ERROR' text or raise); empty text is never stored.
+    """
+    if not text.strip() or text.startswith("-- ERROR"):
+        return
+    cache_path = prompt_cache_path(prompt, generation_config)
+    fd, tmp_path = tempfile.mkstemp(dir=CACHE_DIR, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp_path, cache_path)
+    except OSError as e:
+        print(f"Error writing prompt cache: {e}", file=sys.stderr)
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+async def cached_call_generative_model(prompt, generation_config=None, validate=None):
+    """
+    Call the generative model, reusing the stored response for an identical prompt.
+    
+    Args:
+        prompt (str): The prompt to send to the model.
+        generation_config (dict): Optional generation settings passed to the model.
+        validate (callable): Optional check that the caller can use a response;
+            responses failing it are neither stored nor replayed.
+    
+    Returns:
+        str: Generated text or error message.
+    """
+    loop = asyncio.get_running_loop()
+    cached = await loop.run_in_executor(IO_EXECUTOR, load_cached_response, prompt, generation_config)
+    if cached is not None and (validate is None or validate(cached)):
+        print("Prompt cache hit, skipping model call.")
+        return cached
+    text = await call_generative_model(prompt, generation_config=generation_config)
+    if validate is None or validate(text):
+        await loop.run_in_executor(IO_EXECUTOR, store_cached_response, prompt, text, generation_config)
+    return text
+
+async def call_generative_model_batches(prompts, generation_config=None, validate=None):
+    """
+    Send several prompts concurrently, at most MAX_CONCURRENT_LLM_CALLS at a time.
+    
+    Args:
+        prompts (list): The prompts to send to the model.
+        generation_config (dict): Optional generation settings passed to the model.
+        validate (callable): Optional usability check, see cached_call_generative_model.
+    
+    Returns:
+        list: Generated text or error message for each prompt, in order.
+    """
+    # LLM_SEMAPHORE in the model call bounds in-flight requests across all uploads
+    print(f"Dispatching {len(prompts)} prompt batch(es)...")
+    return await asyncio.gather(*[cached_call_generative_model(p, generation_config, validate) for p in prompts])
+
+async def cached_stream_generative_model(prompt, validate=None):
+    """
+    Stream the model's response, replaying the stored response for an identical prompt.
+    
+    Args:
+        prompt (str): The prompt to send to the model.
+        validate (callable): Optional usability check, see cached_call_generative_model.
+    
+    Yields:
+        str: Text chunks; a cache hit is yielded as a single chunk.
+    """
+    loop = asyncio.get_running_loop()
+    cached = await loop.run_in_executor(IO_EXECUTOR, load_cached_response, prompt)
+    if cached is not None and (validate is None or validate(cached)):
+        print("Prompt cache hit, skipping model call.")
+        yield cached
+        return
+    parts = []
+    async for text in stream_generative_model(prompt):
+        parts.append(text)
+        yield text
+    text = "".join(parts)
+    if validate is None or validate(text):
+        await loop.run_in_executor(IO_EXECUTOR, store_cached_response, prompt, text)
+
+async def stream_generative_model(prompt, model_name=MODEL_NAME):
+    """
+    Stream the generative model's response for the provided prompt.
+    
+    Args:
+        prompt (str): The prompt to send to the model.
+        model_name (str): The model to use.
+    
+    Yields:
+        str: Text chunks as they are generated.
+
+    Raises:
+        RuntimeError: If generation did not finish normally.
+    """
+    print(f"Streaming from Generative Model ({model_name})...")
+    reason = None
+    async with LLM_SEMAPHORE:
+        response = await get_generative_model(model_name).generate_content_async(prompt, stream=True)
+        async for chunk in response:
+            if chunk.candidates:
+                reason = finish_reason_name(chunk.candidates[0])
+            try:
+                text = chunk.text
+            except ValueError:
+                # Chunk without text parts (e.g. safety or finish metadata only)
+                continue
+            if text:
+                yield text
+    if reason != "STOP":
+        # Truncated or filtered mid-stream: the caller must not treat the text as complete
+        raise RuntimeError(f"Generation stopped early (finish reason: {reason}).")
+
+class SqlBlockWriter:
+    """
+    Incrementally extract fenced SQL blocks from streamed model output.
+
+    Mirrors extract_sql_blocks: a block opens on a line ending in ``` or
+    ```sql and closes on the next line starting with ```; a `<<<MODEL i>>>`
+    line discards any block still open. Each completed block is
+    written to the open SQL file as soon as it closes and kept in blocks.
+    Call close after every model response so a fence left open in one
+    response is never paired with the next.
+    """
+
+    def __init__(self, sql_file):
+        self.sql_file = sql_file
+        self.blocks = []
+        self._partial = ""
+        self._block = None
+        self._response_start = 0
+
+    def feed(self, text):
+        """Consume a chunk of model output."""
+        lines = (self._partial + text).split("\n")
+        self._partial = lines.pop()
+        for line in lines:
+            self._handle_line(line)
+
+    def close(self, response_text):
+        """Finish one response; fall back to its whole text when it held no block."""
+        if self._block is not None and self._partial.startswith("```"):
+            self._handle_line(self._partial)
+        self._partial = ""
+        self._block = None
+        if len(self.blocks) == self._response_start:
+            self._write(response_text)
+        self._response_start = len(self.blocks)
+
+    def _handle_line(self, line):
+        if MODEL_MARKER_RE.match(line):
+            self._block = None
+        elif self._block is None:
+            if line.endswith("```") or line.endswith("```sql"):
+                self._block = []
+        elif line.startswith("```"):
+            self._write("\n".join(self._block))
+            self._block = None
+        else:
+            self._block.append(line)
+
+    def _write(self, block):
+        self.blocks.append(block)
+        self.sql_file.write(format_sql_model(len(self.blocks), block))
+        self.sql_file.flush()
+
+def format_sql_model(index, block):
+    """Format one extracted SQL block as a numbered dbt model."""
+    return f"-- dbt model #{index}\n{block.strip()}\n\n"
+
+def has_sql_blocks(dbt_content):
+    """Return True when dbt_content holds at least one fenced SQL block."""
+    return any(FENCE_RE.search(section) for section in MODEL_MARKER_RE.split(dbt_content))
+
+def extract_sql_blocks(dbt_content):
+    """
+    Return the fenced SQL blocks in dbt_content, or the whole text when there are none.
+
+    The text is split on the `<<<MODEL i>>>` lines first, so a stray fence in
+    one model's section cannot pair with the next one.
+    """
+    blocks = [block for section in MODEL_MARKER_RE.split(dbt_content) for block in FENCE_RE.findall(section)]
+    return blocks or [dbt_content]
+
+def write_text_file(path, text):
+    """Write text to path as UTF-8."""
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+
+def write_sql_models(path, sql_blocks):
+    """Write the extracted SQL blocks to path as numbered dbt models."""
+    with open(path, "w", encoding="utf-8") as f:
+        for i, block in enumerate(sql_blocks, start=1):
+            f.write(format_sql_model(i, block))
+
+def zip_entry(arcname):
+    """ZipInfo for an in-memory project file, with a fixed timestamp so no clock lookup is needed."""
+    info = zipfile.ZipInfo(arcname, date_time=(1980, 1, 1, 0, 0, 0))
+    info.compress_type = zipfile.ZIP_DEFLATED
+    info.external_attr = 0o644 << 16
+    return info
+
+def parse_structured_models(text):
+    """
+    Return the SQL of each model in a structured response.
+
+    Falls back to fenced SQL blocks when the text is not the expected JSON;
+    returns an empty list rather than ever treating the raw text as SQL.
+    """
+    try:
+        models = orjson.loads(text)["models"]
+        return [model["sql"] for model in models if model.get("sql")]
+    except (orjson.JSONDecodeError, KeyError, TypeError, AttributeError):
+        return FENCE_RE.findall(text)
+
+def create_dbt_project_files(job_id, safe_filename, sql_blocks):
     """
     Create dbt project files and zip them.
     
     Args:
         job_id (str): Unique job identifier.
         safe_filename (str): Sanitized filename.
-        dbt_content (str): Generated dbt content.
+        sql_blocks (list): SQL blocks extracted from the generated dbt content.
     
     Returns:
         tuple: (zip_path, zip_filename)
     """
-    dbt_dir = os.path.join(RESULTS_DIR, f"dbt_project_{job_id}")
-    os.makedirs(dbt_dir, exist_ok=True)
-    models_dir = os.path.join(dbt_dir, "models")
-    os.makedirs(models_dir, exist_ok=True)
-
-    # Extract SQL blocks
-    sql_blocks = re.findall(r"```(?:sql)?\n(.*?)\n```", dbt_content, flags=re.DOTALL)
-    if not sql_blocks:
-        sql_blocks = [dbt_content]
-        
-    # Save SQL models
-    sql_filename = f"{safe_filename}.sql"
-    sql_path = os.path.join(models_dir, sql_filename)
-    with open(sql_path, "w", encoding="utf-8") as f:
-        for i, block in enumerate(sql_blocks, start=1):
-            f.write(f"-- dbt model #{i}\n{block.strip()}\n\n")
-
-    # Create basic dbt_project.yml
-    dbt_project_yml = """
-name: 'talend_converted_project'
-version: '1.0.0'
-config-version: 2
-profile: 'default'
-model-paths: ["models"]
-    """
-    with open(os.path.join(dbt_dir, "dbt_project.yml"), "w", encoding="utf-8") as f:
-        f.write(dbt_project_yml)
+    combined_sql = "".join(format_sql_model(i, block) for i, block in enumerate(sql_blocks, start=1))
 
-    # Zip the dbt project
+    # Zip the dbt project straight from memory
     zip_filename = f"{job_id}_{safe_filename}_dbt_project.zip"
     zip_path = os.path.join(RESULTS_DIR, zip_filename)
-    with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-        for root, _, files in os.walk(dbt_dir):
-            for file in files:
-                file_path = os.path.join(root, file)
-                arcname = os.path.relpath(file_path, dbt_dir)
-                zipf.write(file_path, arcname)
+    with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED, compresslevel=1) as zipf:
+        zipf.writestr(zip_entry("dbt_project.yml"), DBT_PROJECT_YML, compresslevel=1)
+        zipf.writestr(zip_entry(f"models/{safe_filename}.sql"), combined_sql, compresslevel=1)
 
     return zip_path, zip_filename
 
 # ==============================================================================
-# Flask Routes
+# Quart Routes
 # ==============================================================================
 
+@app.before_serving
+async def warm_up_model():
+    """Prime the model connection in the background so the first /convert skips the TLS handshake."""
+    async def _ping():
+        try:
+            await get_generative_model().generate_content_async(
+                "ping", generation_config={"max_output_tokens": 1}
+            )
+            print("Generative Model connection warmed up.")
+        except Exception as e:
+            print(f"Generative Model warm-up failed: {e}", file=sys.stderr)
+
+    app.add_background_task(_ping)
+
 @app.route("/", methods=["GET"])
-def index():
+async def index():
     """Serve the main HTML page."""
     print("Serving talendtodbt.html")
     try:
-        return send_from_directory(BASE_DIR, "talendtodbt.html")
+        return await send_from_directory(BASE_DIR, "talendtodbt.html")
     except FileNotFoundError:
         print("Error: talendtodbt.html not found", file=sys.stderr)
         return jsonify({"error": "UI file not found"}), 404
 
 @app.route("/convert", methods=["POST"])
-def convert():
+async def convert():
     """Handle file upload, XML parsing, and dbt conversion."""
     print("Received request on /convert endpoint.")
-    if 'file' not in request.files:
+    save_raw = request.args.get('save_raw', '0') == '1'
+    files = await request.files
+    if 'file' not in files:
         return jsonify({"error": "No file part in the request"}), 400
-    file = request.files['file']
+    file = files['file']
     if not file or not file.filename:
         return jsonify({"error": "No file selected"}), 400
     if not file.filename.lower().endswith(('.xml', '.item')):
         return jsonify({"error": "Invalid file type. Upload '.item' or '.xml'."}), 400
 
     # File Handling
-    job_id = str(uuid.uuid4())
+    job_id = secrets.token_hex(16)
     safe_filename = secure_filename(os.path.splitext(file.filename)[0]) or "talend_job"
     xml_name = f"{job_id}_{safe_filename}.item"
     xml_path = os.path.join(UPLOAD_DIR, xml_name)
@@ -298,64 +687,58 @@ def convert():
     sql_path = os.path.join(RESULTS_DIR, sql_filename)
 
     try:
-        file.save(xml_path)
+        await file.save(xml_path)
         print(f"Uploaded file saved to: {xml_path}")
-
-        with open(xml_path, "r", encoding="utf-8", errors="replace") as f:
-            xml_content = f.read()
-        if not xml_content:
+        if not os.path.getsize(xml_path):
             return jsonify({"error": "XML file is empty", "job_id": job_id}), 400
 
-        # Parse XML
-        talend_summary = extract_metadata_map(xml_path) #parse_talend_xml(xml_content)
+        # Parse XML from the saved bytes; no decoded copy is kept in memory
+        talend_summary = await asyncio.to_thread(extract_metadata_map, xml_path)
         if "error" in talend_summary:
             return jsonify({"error": talend_summary["error"], "job_id": job_id}), 500
 
-        # Create LLM Prompt
-        prompt = f"""
-you are an expert data engineer who is excel at migrating talend to DBT from json. parsed json into corresponding dbt models (SQL and YAML configuration). Use the parsed json if available, otherwise analyze the raw XML.
-jsonfile:
-```json
-{json.dumps(talend_summary, indent=4)}
-```
-**Instructions:**
-1. Generate dbt SQL models (.sql files) based on the Talend job logic.
-2. Include a `dbt_project.yml` configuration file.
-3. Provide detailed comments in the SQL files.
-4. Handle tMap components by converting mappings to SQL transformations.
-5. Return SQL code blocks marked by ```sql\n...\n```.
-"""
-        # Call LLM
-        dbt_content = call_generative_model(prompt)
-        if dbt_content.startswith("-- ERROR"):
-            return jsonify({"error": dbt_content, "job_id": job_id}), 500
-
-        # Save Raw Output
-        with open(raw_filepath, "w", encoding="utf-8") as f:
-            f.write(dbt_content)
-
-        # Extract SQL Blocks
-        sql_blocks = re.findall(r"```(?:sql)?\n(.*?)\n```", dbt_content, flags=re.DOTALL)
-        if not sql_blocks:
-            sql_blocks = [dbt_content]
+        # Create LLM Prompts, one per batch of components
+        prompts = build_conversion_prompts(talend_summary, structured_output=True)
 
-        # Save SQL File
-        with open(sql_path, "w", encoding="utf-8") as f:
-            for i, block in enumerate(sql_blocks, start=1):
-                f.write(f"-- dbt model #{i}\n{block.strip()}\n\n")
-
-        # Create dbt Project ZIP
-        zip_path, zip_filename = create_dbt_project_files(job_id, safe_filename, dbt_content)
+        # Call LLM
+        responses = await call_generative_model_batches(
+            prompts, CONVERSION_GENERATION_CONFIG, validate=lambda text: bool(parse_structured_models(text))
+        )
+        failed = next((r for r in responses if r.startswith("-- ERROR")), None)
+        if failed:
+            return jsonify({"error": failed, "job_id": job_id}), 500
+        dbt_content = "\n\n".join(responses)
+
+        # Extract SQL Blocks, per batch response
+        sql_blocks = []
+        for batch_no, text in enumerate(responses, start=1):
+            batch_blocks = parse_structured_models(text)
+            if not batch_blocks:
+                error = f"-- ERROR: Batch {batch_no} returned no parseable SQL models."
+                return jsonify({"error": error, "job_id": job_id}), 500
+            sql_blocks.extend(batch_blocks)
+
+        # Save the SQL file, the dbt project ZIP and (on request) the raw output in parallel
+        loop = asyncio.get_running_loop()
+        writes = [
+            loop.run_in_executor(IO_EXECUTOR, create_dbt_project_files, job_id, safe_filename, sql_blocks),
+            loop.run_in_executor(IO_EXECUTOR, write_sql_models, sql_path, sql_blocks),
+        ]
+        if save_raw:
+            writes.append(loop.run_in_executor(IO_EXECUTOR, write_text_file, raw_filepath, dbt_content))
+        (zip_path, zip_filename), *_ = await asyncio.gather(*writes)
 
         host_url = request.host_url.rstrip("/")
+        files = {
+            "sql": f"{host_url}/download/{sql_filename}",
+            "dbt_project_zip": f"{host_url}/download/{zip_filename}"
+        }
+        if save_raw:
+            files = {"raw_txt": f"{host_url}/download/{raw_filename}", **files}
         return jsonify({
             "job_id": job_id,
             "raw_output": dbt_content,
-            "files": {
-                "raw_txt": f"{host_url}/download/{raw_filename}",
-                "sql": f"{host_url}/download/{sql_filename}",
-                "dbt_project_zip": f"{host_url}/download/{zip_filename}"
-            }
+            "files": files
         }), 200
 
     except Exception as e:
@@ -363,11 +746,108 @@ jsonfile:
         traceback.print_exc()
         return jsonify({"error": str(e), "job_id": job_id}), 500
 
+def sse_event(event, data):
+    """Format one Server-Sent Events message with a JSON payload."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.route("/convert_stream", methods=["POST"])
+async def convert_stream():
+    """Like /convert, but streams the model output back as Server-Sent Events."""
+    print("Received request on /convert_stream endpoint.")
+    save_raw = request.args.get('save_raw', '0') == '1'
+    files = await request.files
+    if 'file' not in files:
+        return jsonify({"error": "No file part in the request"}), 400
+    file = files['file']
+    if not file or not file.filename:
+        return jsonify({"error": "No file selected"}), 400
+    if not file.filename.lower().endswith(('.xml', '.item')):
+        return jsonify({"error": "Invalid file type. Upload '.item' or '.xml'."}), 400
+
+    # File Handling
+    job_id = secrets.token_hex(16)
+    safe_filename = secure_filename(os.path.splitext(file.filename)[0]) or "talend_job"
+    xml_name = f"{job_id}_{safe_filename}.item"
+    xml_path = os.path.join(UPLOAD_DIR, xml_name)
+    raw_filename = f"{job_id}_llm_raw_output.txt"
+    raw_filepath = os.path.join(RESULTS_DIR, raw_filename)
+    sql_filename = f"{job_id}_{safe_filename}.sql"
+    sql_path = os.path.join(RESULTS_DIR, sql_filename)
+
+    try:
+        await file.save(xml_path)
+        print(f"Uploaded file saved to: {xml_path}")
+        if not os.path.getsize(xml_path):
+            return jsonify({"error": "XML file is empty", "job_id": job_id}), 400
+
+        # Parse XML
+        talend_summary = await asyncio.to_thread(extract_metadata_map, xml_path)
+        if "error" in talend_summary:
+            return jsonify({"error": talend_summary["error"], "job_id": job_id}), 500
+        prompts = build_conversion_prompts(talend_summary)
+    except Exception as e:
+        print(f"Error in /convert_stream: {e}", file=sys.stderr)
+        traceback.print_exc()
+        return jsonify({"error": str(e), "job_id": job_id}), 500
+
+    host_url = request.host_url.rstrip("/")
+
+    async def generate():
+        # Batches are streamed one after another so chunks arrive in order
+        loop = asyncio.get_running_loop()
+        parts = []
+        try:
+            raw_target = open(raw_filepath, "w", encoding="utf-8") if save_raw else contextlib.nullcontext()
+            with raw_target as raw_file, open(sql_path, "w", encoding="utf-8") as sql_file:
+                writer = SqlBlockWriter(sql_file)
+
+                def write_chunk(text):
+                    if raw_file:
+                        raw_file.write(text)
+                    writer.feed(text)
+
+                for batch_no, prompt in enumerate(prompts):
+                    if batch_no and raw_file:
+                        await loop.run_in_executor(IO_EXECUTOR, raw_file.write, "\n\n")
+                    response_parts = []
+                    async for text in cached_stream_generative_model(prompt, validate=has_sql_blocks):
+                        response_parts.append(text)
+                        # Awaited per chunk, so writes stay in stream order
+                        await loop.run_in_executor(IO_EXECUTOR, write_chunk, text)
+                        yield sse_event("chunk", {"text": text})
+                    response_text = "".join(response_parts)
+                    await loop.run_in_executor(IO_EXECUTOR, writer.close, response_text)
+                    parts.append(response_text)
+                dbt_content = "\n\n".join(parts)
+
+            # Create dbt Project ZIP
+            zip_path, zip_filename = await loop.run_in_executor(
+                IO_EXECUTOR, create_dbt_project_files, job_id, safe_filename, writer.blocks
+            )
+            files = {
+                "sql": f"{host_url}/download/{sql_filename}",
+                "dbt_project_zip": f"{host_url}/download/{zip_filename}"
+            }
+            if save_raw:
+                files = {"raw_txt": f"{host_url}/download/{raw_filename}", **files}
+            yield sse_event("done", {
+                "job_id": job_id,
+                "raw_output": dbt_content,
+                "files": files
+            })
+        except Exception as e:
+            print(f"Error in /convert_stream: {e}", file=sys.stderr)
+            traceback.print_exc()
+            yield sse_event("error", {"error": f"-- ERROR: Failed to generate content: {e}", "job_id": job_id})
+
+    return Response(generate(), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
 @app.route("/generate_sql", methods=["POST"])
-def generate_sql():
+async def generate_sql():
     """Generate commented SQL from JSON input."""
     try:
-        data = request.get_json()
+        data = await request.get_json()
         if not data:
             return jsonify({"error": "No JSON payload provided"}), 400
 
@@ -383,15 +863,15 @@ Raw Output:
 3. Ensure dbt compatibility with proper syntax.
 4. Return the SQL content as plain text.
 """
-        sql_text = call_generative_model(prompt)
+        sql_text = await cached_call_generative_model(prompt)
         if sql_text.startswith("-- ERROR"):
             return jsonify({"error": sql_text}), 500
 
-        job_id = data.get('job_id', str(uuid.uuid4()))
+        # The commented SQL file is the deliverable of this endpoint, so it is always written
+        job_id = data.get('job_id') or secrets.token_hex(16)
         commented_fn = f"{job_id}_commented.sql"
         commented_path = os.path.join(RESULTS_DIR, commented_fn)
-        with open(commented_path, "w", encoding="utf-8") as f:
-            f.write(sql_text)
+        await asyncio.get_running_loop().run_in_executor(IO_EXECUTOR, write_text_file, commented_path, sql_text)
 
         host_url = request.host_url.rstrip("/")
         return jsonify({
@@ -404,10 +884,10 @@ Raw Output:
         return jsonify({"error": str(e)}), 500
 
 @app.route("/download/<filename>", methods=["GET"])
-def download(filename):
+async def download(filename):
     """Download a generated file."""
     try:
-        return send_from_directory(RESULTS_DIR, filename, as_attachment=True)
+        return await send_from_directory(RESULTS_DIR, filename, as_attachment=True)
     except FileNotFoundError:
         print(f"Error: File {filename} not found in {RESULTS_DIR}", file=sys.stderr)
         return jsonify({"error": "File not found"}), 404
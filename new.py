@@ -1,10 +1,11 @@
 #!/usr/bin/env python3
 import os
 import sys
-import uuid
+import secrets
 import re
-import json
 import traceback
+import threading
+import orjson
 from dotenv import load_dotenv
 
 load_dotenv()  # Load .env file
@@ -31,6 +32,29 @@ if not API_KEY:
 genai.configure(api_key=API_KEY)
 MODEL_NAME = "gemini-2.0-flash"
 
+# GenerativeModel instances, built once per model name and reused across requests
+_MODELS = {}
+
+def get_generative_model(model_name=MODEL_NAME):
+    """Return the cached GenerativeModel for model_name, creating it on first use."""
+    model = _MODELS.get(model_name)
+    if model is None:
+        model = genai.GenerativeModel(model_name=model_name)
+        _MODELS[model_name] = model
+    return model
+
+def _warm_up_model():
+    # Prime the model connection so the first request skips the TLS handshake
+    try:
+        get_generative_model().generate_content("ping", generation_config={"max_output_tokens": 1})
+    except Exception as e:
+        print(f"Model warm-up failed: {e}", file=sys.stderr)
+
+threading.Thread(target=_warm_up_model, daemon=True).start()
+
+# Fenced code blocks (```sql ... ```) in the model output
+FENCE_RE = re.compile(r"```(?:sql)?\n(.*?)\n```", re.S)
+
 # ==== FLASK SETUP ====
 app = Flask(__name__, static_folder=BASE_DIR, static_url_path="")
 CORS(app)
@@ -43,6 +67,8 @@ def index():
 
 # Convert endpoint: XML → raw_output + SQL skeleton
 @app.route("/convert", methods=["POST"])
+# No streaming here: /convert_stream answers with the same JSON as /convert
+@app.route("/convert_stream", methods=["POST"])
 def convert():
     try:
         if 'file' not in request.files:
@@ -51,13 +77,13 @@ def convert():
         if file.filename == '':
             return jsonify({"error": "No file selected"}), 400
 
-        job_id   = str(uuid.uuid4())
+        job_id   = secrets.token_hex(16)
         xml_name = secure_filename(f"{job_id}.item")
         xml_path = os.path.join(UPLOAD_DIR, xml_name)
-        file.save(xml_path)
-
-        with open(xml_path, "r", encoding="utf-8", errors="replace") as f:
-            xml_content = f.read()
+        xml_bytes = file.stream.read()
+        with open(xml_path, "wb") as out:
+            out.write(xml_bytes)
+        xml_content = xml_bytes.decode("utf-8", errors="replace")
 
         prompt = (
             "You are a Data Build Tool expert.\n"
@@ -65,7 +91,7 @@ def convert():
             + xml_content
         )
 
-        model    = genai.GenerativeModel(model_name=MODEL_NAME)
+        model    = get_generative_model()
         response = model.generate_content(prompt)
         raw_txt  = response.text
 
@@ -76,7 +102,7 @@ def convert():
             out.write(raw_txt)
 
         # Extract SQL code blocks or use full text
-        blocks = re.findall(r"```(?:sql)?\n(.*?)\n```", raw_txt, flags=re.S)
+        blocks = FENCE_RE.findall(raw_txt)
         if not blocks:
             blocks = [raw_txt]
 
@@ -111,15 +137,15 @@ def generate_sql():
         prompt = (
             "The following JSON represents dbt model SQL skeletons extracted from a Talend job.\n"
             "Generate a single, properly formatted SQL file with detailed comments for each model make sure not not exclude anything in the json:\n"
-            + json.dumps(data, indent=2)
+            + orjson.dumps(data, option=orjson.OPT_INDENT_2).decode()
         )
 
-        model    = genai.GenerativeModel(model_name=MODEL_NAME)
+        model    = get_generative_model()
         response = model.generate_content(prompt)
         sql_text = response.text
 
         # Save the commented SQL
-        job_id        = str(uuid.uuid4())
+        job_id        = secrets.token_hex(16)
         commented_fn  = secure_filename(f"{job_id}_commented.sql")
         commented_path= os.path.join(RESULTS_DIR, commented_fn)
         with open(commented_path, "w", encoding="utf-8") as out:
@@ -4,12 +4,24 @@ import yaml
 import sys
 import uuid
 import re
-import json
 import traceback
 import zipfile
-from xml.etree import ElementTree as ET
+try:
+    from lxml.etree import iterparse
+    # Never expand external entities or fetch DTDs from uploaded XML
+    ITERPARSE_KWARGS = {"resolve_entities": False, "no_network": True}
+except ImportError:
+    try:
+        from xml.etree.cElementTree import iterparse
+    except ImportError:
+        from xml.etree.ElementTree import iterparse
+    ITERPARSE_KWARGS = {}
 import logging
-import requests
+import asyncio
+import atexit
+import threading
+import httpx
+import orjson
 EYQ_INCUBATOR_ENDPOINT=os.getenv("EYQ_INCUBATOR_ENDPOINT")
 EYQ_INCUBATOR_KEY=os.getenv("EYQ_INCUBATOR_KEY")
 # Configure logger
@@ -23,59 +35,111 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 def extract_metadata_map(xml_file_path):
-    tree = ET.parse(xml_file_path)
-    root = tree.getroot()
-
     metadata = {
         "job": {
-            "name": root.attrib.get("label"),
-            "version": root.attrib.get("version")
+            "name": None,
+            "version": None
         },
         "components": [],
         "connections": []
     }
 
-    for node in root.findall(".//node"):
-        component = {
-            "component_name": node.attrib.get("componentName"),
-            "unique_name": node.attrib.get("componentName") + "_" + node.attrib.get("componentVersion", "1.0"),
-            "parameters": {param.attrib['name']: param.attrib.get('value') for param in node.findall("elementParameter")},
-            "metadata": []
-        }
-
-        for md in node.findall(".//metadata"):
-            schema = {
-                "name": md.attrib.get("name"),
-                "columns": []
+    root = None
+    for event, elem in iterparse(xml_file_path, events=("start", "end"), **ITERPARSE_KWARGS):
+        if event == "start":
+            if root is None:
+                root = elem
+                metadata["job"]["name"] = root.attrib.get("label")
+                metadata["job"]["version"] = root.attrib.get("version")
+            continue
+
+        tag = elem.tag.rpartition("}")[2]
+        if tag == "node":
+            component = {
+                "component_name": elem.attrib.get("componentName"),
+                "unique_name": elem.attrib.get("componentName") + "_" + elem.attrib.get("componentVersion", "1.0"),
+                "parameters": {param.attrib['name']: param.attrib.get('value') for param in elem.findall("elementParameter")},
+                "metadata": []
             }
-            for col in md.findall(".//column"):
-                schema["columns"].append({
-                    "name": col.attrib.get("name"),
-                    "type": col.attrib.get("type")
-                })
-            component["metadata"].append(schema)
-
-        metadata["components"].append(component)
-
-    for conn in root.findall(".//connection"):
-        metadata["connections"].append({
-            "source": conn.attrib.get("source"),
-            "target": conn.attrib.get("target"),
-            "label": conn.attrib.get("label"),
-            "type": conn.attrib.get("connectorName")
-        })
+
+            for md in elem.iter("metadata"):
+                schema = {
+                    "name": md.attrib.get("name"),
+                    "columns": []
+                }
+                for col in md.iter("column"):
+                    schema["columns"].append({
+                        "name": col.attrib.get("name"),
+                        "type": col.attrib.get("type")
+                    })
+                component["metadata"].append(schema)
+
+            metadata["components"].append(component)
+            elem.clear()
+
+        elif tag == "connection":
+            metadata["connections"].append({
+                "source": elem.attrib.get("source"),
+                "target": elem.attrib.get("target"),
+                "label": elem.attrib.get("label"),
+                "type": elem.attrib.get("connectorName")
+            })
+            elem.clear()
     save_metadata_yml(metadata)
     return metadata
 
-def save_metadata_yml(metadata, output_path="talend_metadata.json"):
-    with open(output_path, "w") as f:
-        json.dump(metadata, f, sort_keys=False)
-    print(f"✅ Metadata saved to {output_path}:{json.dumps(metadata.get('connections', []), indent=2)}")
+def save_metadata_yml(metadata, output_path="talend_metadata.json", pretty=False):
+    with open(output_path, "wb") as f:
+        f.write(orjson.dumps(metadata, option=orjson.OPT_INDENT_2 if pretty else 0))
+    logger.info("✅ Metadata saved to %s: %d connections, %d components",
+                output_path, len(metadata.get("connections", [])), len(metadata.get("components", [])))
 
 meta = extract_metadata_map("subjob_CostCentre_Language_SOAR_2.9.item")
 #print(yaml.dump(meta, sort_keys=False))
 #save_metadata_yml(meta)
-def call_generative_model(prompt):
+# Pooled HTTP/2 client, shared by every LLM call so TLS connections are kept alive.
+# It lives on a background event loop so synchronous Flask handlers can use it too.
+# Both are created on first use, so importing this module starts nothing.
+_LOOP = None
+_HTTPX = None
+_HTTP_LOCK = threading.Lock()
+# Concurrency limits for call_generative_models; only touched from _LOOP
+_SEMAPHORES = {}
+
+def _get_loop():
+    """Return the background event loop, starting it and the HTTP client on first use."""
+    global _LOOP, _HTTPX
+    with _HTTP_LOCK:
+        if _LOOP is None:
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name="llm-http-loop", daemon=True).start()
+            _HTTPX = httpx.AsyncClient(
+                http2=True,
+                limits=httpx.Limits(max_keepalive_connections=16, max_connections=32),
+                timeout=120
+            )
+            _LOOP = loop
+            atexit.register(_close_http_client)
+    return _LOOP
+
+def _close_http_client():
+    asyncio.run_coroutine_threadsafe(_HTTPX.aclose(), _LOOP).result(timeout=5)
+    _LOOP.call_soon_threadsafe(_LOOP.stop)
+
+async def _warm_up_http_client():
+    # Open a pooled TLS connection before the first LLM request needs it
+    try:
+        await _HTTPX.head(EYQ_INCUBATOR_ENDPOINT)
+        logger.info("EYQ endpoint connection warmed up.")
+    except Exception as e:
+        logger.warning(f"EYQ endpoint warm-up failed: {e}")
+
+def warm_up_http_client():
+    """Start the shared HTTP client and open a connection to the EYQ endpoint in the background."""
+    if EYQ_INCUBATOR_ENDPOINT:
+        asyncio.run_coroutine_threadsafe(_warm_up_http_client(), _get_loop())
+
+async def call_generative_model_async(prompt):
     """
     Call the GPT-4 Turbo model via EYQ Incubator endpoint.
     
@@ -94,15 +158,57 @@ def call_generative_model(prompt):
         "temperature": 0.7
     }
     try:
-        response = requests.post(
+        response = await _HTTPX.post(
             f"{EYQ_INCUBATOR_ENDPOINT}",
-            headers=headers, json=payload, params={"api-version": "2023-05-15"}, timeout=120
+            headers=headers, json=payload, params={"api-version": "2023-05-15"}
         )
         response.raise_for_status()
         result = response.json()
         if not result.get("choices"):
             return f"-- ERROR: Content generation failed (prompt blocked?)."
-        return result["choices"][0]["message"]["content"].strip()
+        choice = result["choices"][0]
+        if choice.get("finish_reason") not in (None, "stop"):
+            # Truncated ("length") or filtered output is incomplete
+            return f"-- ERROR: Generation stopped early (finish reason: {choice['finish_reason']})."
+        return choice["message"]["content"].strip()
     except Exception as e:
         logger.error(f"Error calling GPT-4 Turbo: {e}")
-        return f"-- ERROR: Failed to generate content: {e}"
\ No newline at end of file
+        return f"-- ERROR: Failed to generate content: {e}"
+
+def call_generative_model(prompt):
+    """
+    Blocking wrapper around call_generative_model_async for synchronous callers.
+    
+    Args:
+        prompt (str): The prompt to send to the model.
+    
+    Returns:
+        str: Generated text or error message.
+    """
+    return asyncio.run_coroutine_threadsafe(call_generative_model_async(prompt), _get_loop()).result()
+
+def call_generative_models(prompts, max_concurrency=None):
+    """
+    Send several prompts concurrently over the shared connection pool.
+    
+    Args:
+        prompts (list): The prompts to send to the model.
+        max_concurrency (int): Upper bound on in-flight requests across all callers (unbounded if None).
+    
+    Returns:
+        list: Generated text or error message for each prompt, in order.
+    """
+    async def _gather():
+        if max_concurrency is None:
+            return await asyncio.gather(*[call_generative_model_async(p) for p in prompts])
+        # One semaphore per limit, shared by every caller, so the cap holds across requests
+        semaphore = _SEMAPHORES.get(max_concurrency)
+        if semaphore is None:
+            semaphore = _SEMAPHORES[max_concurrency] = asyncio.Semaphore(max_concurrency)
+
+        async def _call(prompt):
+            async with semaphore:
+                return await call_generative_model_async(prompt)
+
+        return await asyncio.gather(*[_call(p) for p in prompts])
+    return asyncio.run_coroutine_threadsafe(_gather(), _get_loop()).result()
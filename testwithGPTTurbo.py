@@ -4,20 +4,43 @@
 # Standard library imports
 import os
 import sys
-import uuid
+import secrets
 import re
-import json
 import traceback
 import zipfile
-from xml.etree import ElementTree as ET
+import io
+import hashlib
+import tempfile
+import concurrent.futures
+# XML parser: lxml when installed (faster, releases the GIL), else the C-accelerated ElementTree
+try:
+    from lxml.etree import iterparse, XMLSyntaxError as ParseError
+    # Never expand external entities or fetch DTDs from uploaded XML
+    ITERPARSE_KWARGS = {"resolve_entities": False, "no_network": True}
+except ImportError:
+    try:
+        from xml.etree.cElementTree import iterparse, ParseError
+    except ImportError:
+        from xml.etree.ElementTree import iterparse, ParseError
+    ITERPARSE_KWARGS = {}
 from test import *
 
+# Optional SIMD deflate/crc32 for the dbt project zip (pip install zlib-ng)
+try:
+    from zlib_ng import zlib_ng
+    # zipfile binds crc32 at import time, so swapping the module alone only changes deflate
+    zipfile.zlib = zlib_ng
+    zipfile.crc32 = zlib_ng.crc32
+except ImportError:
+    pass
+
 # Third-party imports
 from dotenv import load_dotenv
 from flask import Flask, request, jsonify, send_from_directory
 from werkzeug.utils import secure_filename
 from flask_cors import CORS
 import google.generativeai as genai
+import orjson
 
 # ==============================================================================
 # Configuration & Initialization
@@ -49,7 +72,8 @@ print(f"Using Generative Model: {MODEL_NAME}")
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 UPLOAD_DIR = os.path.join(BASE_DIR, "uploads")
 RESULTS_DIR = os.path.join(BASE_DIR, "results")
-for d in (UPLOAD_DIR, RESULTS_DIR):
+CACHE_DIR = os.path.join(RESULTS_DIR, "_cache")
+for d in (UPLOAD_DIR, RESULTS_DIR, CACHE_DIR):
     os.makedirs(d, exist_ok=True)
 print(f"Uploads directory: {UPLOAD_DIR}")
 print(f"Results directory: {RESULTS_DIR}")
@@ -60,16 +84,68 @@ CORS(app)
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16 MB
 print("Flask app initialized with CORS enabled.")
 
+# Open the pooled EYQ connection now rather than on the first /convert
+warm_up_http_client()
+
 # ==============================================================================
 # Helper Functions
 # ==============================================================================
 
+# GenerativeModel instances, built once per model name and reused across requests
+_MODELS = {}
+
+def get_generative_model(model_name=MODEL_NAME):
+    """Return the cached GenerativeModel for model_name, creating it on first use."""
+    model = _MODELS.get(model_name)
+    if model is None:
+        model = genai.GenerativeModel(model_name=model_name)
+        _MODELS[model_name] = model
+    return model
+
+# Components sent to the model per prompt, and how many prompts may be in flight
+COMPONENT_BATCH_SIZE = 8
+MAX_CONCURRENT_LLM_CALLS = 8
+
+# Small pool so the result files of one request are written in parallel
+IO_EXECUTOR = concurrent.futures.ThreadPoolExecutor(max_workers=4, thread_name_prefix="io")
+
+# Basic dbt_project.yml shipped in every generated project
+DBT_PROJECT_YML = """
+name: 'talend_converted_project'
+version: '1.0.0'
+config-version: 2
+profile: 'default'
+model-paths: ["models"]
+    """
+
+# Fenced code blocks (```sql ... ```) in the model output
+FENCE_RE = re.compile(r"```(?:sql)?\n(.*?)\n```", re.DOTALL)
+# `<<<MODEL i>>>` delimiter lines the fenced prompts put before each model
+MODEL_MARKER_RE = re.compile(r"^<<<MODEL \d+>>>$", re.MULTILINE)
+
+# Parameters that carry no conversion value and are left out of the summary
+PARAM_SKIP = frozenset([
+    "UNIQUE_NAME", "COMPONENT_NAME", "LABEL", "CONNECTION_FORMAT",
+    "CHECK_NUM", "CHECK_UNIQUE_NAME", "ACTIVATE", "LOG4J_ACTIVATE",
+    "START", "STARTABLE", "SUBTREE_START", "END_OF_FLOW",
+    "PROCESS_TYPE_VERSION", "PROCESS_TYPE_CONTEXT", "PROCESS_TYPE_PROCESS",
+    "QUERYSTORE", "UPDATE_COMPONENTS", "CURRENT_OS"
+])
+
+def local_name(tag):
+    """Strip the '{namespace}' prefix from an element tag."""
+    return tag.rpartition('}')[2]
+
 def parse_talend_xml(xml_content):
     """
     Parse Talend XML (.item file) to extract components, connections, metadata, and notes.
+
+    The document is read in a single streaming pass with iterparse; each
+    <node>, <connection> and <note> is cleared once it has been handled.
     
     Args:
-        xml_content (str): Content of the Talend XML file.
+        xml_content (bytes | str | file): Content of the Talend XML file, or a
+            binary file object such as an upload's stream.
     
     Returns:
         dict: Summary of job structure or error details.
@@ -83,101 +159,49 @@ def parse_talend_xml(xml_content):
     }
     print("Starting XML parsing...")
     try:
-        namespaces = {
-            'TalendProperties': 'http://www.talend.org/properties',
-            'xmi': 'http://www.omg.org/XMI',
-            'talendfile': 'platform:/resource/org.talend.model/model/TalendFile.xsd',
-        }
-        root = ET.fromstring(xml_content)
-        print("XML root element parsed.")
+        if isinstance(xml_content, str):
+            xml_content = xml_content.encode("utf-8")
+        source = io.BytesIO(xml_content) if isinstance(xml_content, bytes) else xml_content
+        property_label = None
+        process_type_name = None
+
+        for _, elem in iterparse(source, events=("end",), **ITERPARSE_KWARGS):
+            tag = local_name(elem.tag)
+
+            # Extract Components
+            if tag == 'node':
+                summary["components"].append(_parse_component(elem, summary["metadata"]))
+                elem.clear()
+
+            # Extract Connections
+            elif tag == 'connection':
+                summary["connections"].append({
+                    "source_component_id": elem.get('source'), "target_component_id": elem.get('target'),
+                    "connector_name": elem.get('connectorName'), "line_style": elem.get('lineStyle'),
+                    "metadata_name": elem.get('metaname')
+                })
+                elem.clear()
 
-        # Extract Job Name
-        job_info = root.find('.//TalendProperties:Property', namespaces=namespaces)
-        if job_info is not None and job_info.get("label"):
-            summary["job_name"] = job_info.get("label")
-        else:
-            process_type = root.find('.//processType')
-            if process_type is not None and process_type.get("name"):
-                summary["job_name"] = process_type.get("name")
-        print(f"Found job name: {summary['job_name']}")
+            # Extract Notes
+            elif tag == 'note':
+                summary["notes"].append(elem.get('text'))
+                elem.clear()
 
-        # Extract Components
-        for node in root.findall('.//node'):
-            component_name = node.get('componentName')
-            unique_name = node.get('uniqueName')
-            label = unique_name
-            params = {}
-            for param in node.findall('.//elementParameter'):
-                field = param.get('field')
-                name = param.get('name')
-                value = param.text if param.text is not None else param.get('value')
-                if value is not None and field and name and name not in [
-                    "UNIQUE_NAME", "COMPONENT_NAME", "LABEL", "CONNECTION_FORMAT",
-                    "CHECK_NUM", "CHECK_UNIQUE_NAME", "ACTIVATE", "LOG4J_ACTIVATE",
-                    "START", "STARTABLE", "SUBTREE_START", "END_OF_FLOW", "ACTIVATE",
-                    "PROCESS_TYPE_VERSION", "PROCESS_TYPE_CONTEXT", "PROCESS_TYPE_PROCESS",
-                    "QUERYSTORE", "UPDATE_COMPONENTS", "CURRENT_OS"
-                ]:
-                    cleaned_value = value.strip('"') if isinstance(value, str) else value
-                    params[name] = cleaned_value
-                if component_name == 'tMap':
-                    if name == 'VAR_TABLE': params['tMap_variables_raw'] = value
-                    if name == 'OUTPUT_TABLES': params['tMap_outputs_raw'] = value
-                elif name == 'QUERY' and value:
-                    params['sql_query'] = value.strip('"') if isinstance(value, str) else value
-                elif name == 'FILENAME' and value:
-                    params['filepath'] = value.strip('"') if isinstance(value, str) else value
-                elif name == 'TABLE' and value:
-                    params['db_table_name'] = value.strip('"') if isinstance(value, str) else value
-
-            label_param = node.find('.//elementParameter[@name="LABEL"]')
-            if label_param is not None and label_param.get('value'):
-                label = label_param.get('value').strip('"')
-            hint_param = node.find('.//elementParameter[@name="HINT"]')
-            if hint_param is not None and hint_param.get('value'):
-                params["hint"] = hint_param.get('value').strip('"')
-
-            component_data = {
-                "type": component_name, "unique_name": unique_name, "label": label,
-                "parameters": params, "metadata": []
-            }
+            # Job Name candidates
+            elif tag == 'Property' and property_label is None and elem.get("label"):
+                property_label = elem.get("label")
+            elif tag == 'processType' and process_type_name is None and elem.get("name"):
+                process_type_name = elem.get("name")
 
-            for meta_conn in node.findall('.//metadata'):
-                connector_name = meta_conn.get('connector')
-                meta_name = meta_conn.get('name')
-                columns = []
-                for col in meta_conn.findall('.//column'):
-                    col_data = {
-                        "name": col.get('name'), "talend_type": col.get('type'),
-                        "key": col.get('key', 'false') == 'true',
-                        "nullable": col.get('nullable', 'true') == 'true',
-                        "length": col.get('length'), "precision": col.get('precision'),
-                        "comment": col.get('comment')
-                    }
-                    default_val = col.get('defaultValue')
-                    if default_val: col_data['default'] = default_val.strip('"')
-                    columns.append(col_data)
-                component_data["metadata"].append({
-                    "connector_type": connector_name, "name": meta_name, "columns": columns
-                })
-                if meta_name and meta_name not in summary["metadata"]:
-                    summary["metadata"][meta_name] = {"columns": columns}
-            summary["components"].append(component_data)
-
-        # Extract Connections
-        for conn in root.findall('.//connection'):
-            summary["connections"].append({
-                "source_component_id": conn.get('source'), "target_component_id": conn.get('target'),
-                "connector_name": conn.get('connectorName'), "line_style": conn.get('lineStyle'),
-                "metadata_name": conn.get('metaname')
-            })
-
-        # Extract Notes
-        for note in root.findall('.//note'):
-            summary["notes"].append(note.get('text'))
+        print("XML root element parsed.")
+        if property_label:
+            summary["job_name"] = property_label
+        elif process_type_name:
+            summary["job_name"] = process_type_name
+        print(f"Found job name: {summary['job_name']}")
         print("XML parsing finished successfully.")
 
-    except ET.ParseError as e:
+    except ParseError as e:
         print(f"XML Parsing Error: {e}", file=sys.stderr)
         summary["error"] = f"Failed to parse XML: {e}"
     except Exception as e:
@@ -185,6 +209,69 @@ def parse_talend_xml(xml_content):
         summary["error"] = f"Unexpected error during XML parsing: {e}"
     return summary
 
+def _parse_component(node, summary_metadata):
+    """
+    Build the component entry for a single <node> element.
+
+    Args:
+        node (Element): The fully parsed <node> element.
+        summary_metadata (dict): Job-level metadata map, updated in place.
+
+    Returns:
+        dict: Component type, names, parameters and metadata.
+    """
+    component_name = node.get('componentName')
+    unique_name = node.get('uniqueName')
+    label = unique_name
+    params = {}
+    for param in node.iterfind('elementParameter'):
+        field = param.get('field')
+        name = param.get('name')
+        value = param.text if param.text is not None else param.get('value')
+        if name == 'LABEL' and param.get('value'):
+            label = param.get('value').strip('"')
+        elif name == 'HINT' and param.get('value'):
+            params["hint"] = param.get('value').strip('"')
+        if value is not None and field and name and name not in PARAM_SKIP:
+            cleaned_value = value.strip('"') if isinstance(value, str) else value
+            params[name] = cleaned_value
+        if component_name == 'tMap':
+            if name == 'VAR_TABLE': params['tMap_variables_raw'] = value
+            if name == 'OUTPUT_TABLES': params['tMap_outputs_raw'] = value
+        elif name == 'QUERY' and value:
+            params['sql_query'] = value.strip('"') if isinstance(value, str) else value
+        elif name == 'FILENAME' and value:
+            params['filepath'] = value.strip('"') if isinstance(value, str) else value
+        elif name == 'TABLE' and value:
+            params['db_table_name'] = value.strip('"') if isinstance(value, str) else value
+
+    component_data = {
+        "type": component_name, "unique_name": unique_name, "label": label,
+        "parameters": params, "metadata": []
+    }
+
+    for meta_conn in node.iter('metadata'):
+        connector_name = meta_conn.get('connector')
+        meta_name = meta_conn.get('name')
+        columns = []
+        for col in meta_conn.iter('column'):
+            col_data = {
+                "name": col.get('name'), "talend_type": col.get('type'),
+                "key": col.get('key', 'false') == 'true',
+                "nullable": col.get('nullable', 'true') == 'true',
+                "length": col.get('length'), "precision": col.get('precision'),
+                "comment": col.get('comment')
+            }
+            default_val = col.get('defaultValue')
+            if default_val: col_data['default'] = default_val.strip('"')
+            columns.append(col_data)
+        component_data["metadata"].append({
+            "connector_type": connector_name, "name": meta_name, "columns": columns
+        })
+        if meta_name and meta_name not in summary_metadata:
+            summary_metadata[meta_name] = {"columns": columns}
+    return component_data
+
 def call_generative_model1(prompt, model_name=MODEL_NAME):
     """
     Call the generative model with the provided prompt.
@@ -198,7 +285,7 @@ def call_generative_model1(prompt, model_name=MODEL_NAME):
     """
     print(f"Calling Generative Model ({model_name})...")
     try:
-        model = genai.GenerativeModel(model_name=model_name)
+        model = get_generative_model(model_name)
         response = model.generate_content(prompt)
         if not response.candidates:
             return f"-- ERROR: Content generation failed (prompt blocked?)."
@@ -210,55 +297,141 @@ def call_generative_model1(prompt, model_name=MODEL_NAME):
         print(f"Error calling Generative Model: {e}", file=sys.stderr)
         return f"-- ERROR: Failed to generate content: {e}"
 
-def create_dbt_project_files(job_id, safe_filename, dbt_content):
+def prompt_cache_path(prompt, generation_config=None):
+    """Path of the cached response, keyed by a BLAKE2b hash of model, generation config and prompt."""
+    config = orjson.dumps(generation_config, option=orjson.OPT_SORT_KEYS)
+    key = hashlib.blake2b(f"{MODEL_NAME}\n".encode("utf-8") + config + f"\n{prompt}".encode("utf-8"),
+                          digest_size=16).hexdigest()
+    return os.path.join(CACHE_DIR, f"{key}.txt")
+
+def load_cached_response(prompt, generation_config=None):
+    """Return the cached response for prompt, or None on a cache miss."""
+    try:
+        with open(prompt_cache_path(prompt, generation_config), "r", encoding="utf-8") as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+def store_cached_response(prompt, text, generation_config=None):
+    """
+    Atomically write a response to the prompt cache.
+
+    Only complete responses are passed in (truncated or filtered generations
+    come back as '-- ERROR' text or raise); empty text is never stored.
+    """
+    if not text.strip() or text.startswith("-- ERROR"):
+        return
+    cache_path = prompt_cache_path(prompt, generation_config)
+    fd, tmp_path = tempfile.mkstemp(dir=CACHE_DIR, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp_path, cache_path)
+    except OSError as e:
+        print(f"Error writing prompt cache: {e}", file=sys.stderr)
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+def cached_call_generative_model(prompt):
+    """
+    Call the generative model, reusing the stored response for an identical prompt.
+    
+    Args:
+        prompt (str): The prompt to send to the model.
+    
+    Returns:
+        str: Generated text or error message.
+    """
+    cached = load_cached_response(prompt)
+    if cached is not None:
+        print("Prompt cache hit, skipping model call.")
+        return cached
+    text = call_generative_model(prompt)
+    store_cached_response(prompt, text)
+    return text
+
+def call_generative_model_batches(prompts):
+    """
+    Send several prompts concurrently, at most MAX_CONCURRENT_LLM_CALLS at a time.
+
+    Cached responses are reused; only the misses go to the shared HTTP loop
+    in test.py in a single call_generative_models round trip. Only responses
+    holding a fenced SQL block are stored or replayed.
+    
+    Args:
+        prompts (list): The prompts to send to the model.
+    
+    Returns:
+        list: Generated text or error message for each prompt, in order.
+    """
+    responses = [load_cached_response(p) for p in prompts]
+    responses = [text if text is not None and has_sql_blocks(text) else None for text in responses]
+    misses = [i for i, text in enumerate(responses) if text is None]
+    print(f"Dispatching {len(misses)} of {len(prompts)} prompt batch(es) ({len(prompts) - len(misses)} cached)...")
+    if misses:
+        texts = call_generative_models([prompts[i] for i in misses], max_concurrency=MAX_CONCURRENT_LLM_CALLS)
+        for i, text in zip(misses, texts):
+            if has_sql_blocks(text):
+                store_cached_response(prompts[i], text)
+            responses[i] = text
+    return responses
+
+def format_sql_model(index, block):
+    """Format one extracted SQL block as a numbered dbt model."""
+    return f"-- dbt model #{index}\n{block.strip()}\n\n"
+
+def has_sql_blocks(dbt_content):
+    """Return True when dbt_content holds at least one fenced SQL block."""
+    return any(FENCE_RE.search(section) for section in MODEL_MARKER_RE.split(dbt_content))
+
+def extract_sql_blocks(dbt_content):
+    """
+    Return the fenced SQL blocks in dbt_content, or the whole text when there are none.
+
+    The text is split on the `<<<MODEL i>>>` lines first, so a stray fence in
+    one model's section cannot pair with the next one.
+    """
+    blocks = [block for section in MODEL_MARKER_RE.split(dbt_content) for block in FENCE_RE.findall(section)]
+    return blocks or [dbt_content]
+
+def write_text_file(path, text):
+    """Write text to path as UTF-8."""
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+
+def write_sql_models(path, sql_blocks):
+    """Write the extracted SQL blocks to path as numbered dbt models."""
+    with open(path, "w", encoding="utf-8") as f:
+        for i, block in enumerate(sql_blocks, start=1):
+            f.write(format_sql_model(i, block))
+
+def zip_entry(arcname):
+    """ZipInfo for an in-memory project file, with a fixed timestamp so no clock lookup is needed."""
+    info = zipfile.ZipInfo(arcname, date_time=(1980, 1, 1, 0, 0, 0))
+    info.compress_type = zipfile.ZIP_DEFLATED
+    info.external_attr = 0o644 << 16
+    return info
+
+def create_dbt_project_files(job_id, safe_filename, sql_blocks):
     """
     Create dbt project files and zip them.
     
     Args:
         job_id (str): Unique job identifier.
         safe_filename (str): Sanitized filename.
-        dbt_content (str): Generated dbt content.
+        sql_blocks (list): SQL blocks extracted from the generated dbt content.
     
     Returns:
         tuple: (zip_path, zip_filename)
     """
-    dbt_dir = os.path.join(RESULTS_DIR, f"dbt_project_{job_id}")
-    os.makedirs(dbt_dir, exist_ok=True)
-    models_dir = os.path.join(dbt_dir, "models")
-    os.makedirs(models_dir, exist_ok=True)
-
-    # Extract SQL blocks
-    sql_blocks = re.findall(r"```(?:sql)?\n(.*?)\n```", dbt_content, flags=re.DOTALL)
-    if not sql_blocks:
-        sql_blocks = [dbt_content]
-        
-    # Save SQL models
-    sql_filename = f"{safe_filename}.sql"
-    sql_path = os.path.join(models_dir, sql_filename)
-    with open(sql_path, "w", encoding="utf-8") as f:
-        for i, block in enumerate(sql_blocks, start=1):
-            f.write(f"-- dbt model #{i}\n{block.strip()}\n\n")
-
-    # Create basic dbt_project.yml
-    dbt_project_yml = """
-name: 'talend_converted_project'
-version: '1.0.0'
-config-version: 2
-profile: 'default'
-model-paths: ["models"]
-    """
-    with open(os.path.join(dbt_dir, "dbt_project.yml"), "w", encoding="utf-8") as f:
-        f.write(dbt_project_yml)
+    combined_sql = "".join(format_sql_model(i, block) for i, block in enumerate(sql_blocks, start=1))
 
-    # Zip the dbt project
+    # Zip the dbt project straight from memory
     zip_filename = f"{job_id}_{safe_filename}_dbt_project.zip"
     zip_path = os.path.join(RESULTS_DIR, zip_filename)
-    with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-        for root, _, files in os.walk(dbt_dir):
-            for file in files:
-                file_path = os.path.join(root, file)
-                arcname = os.path.relpath(file_path, dbt_dir)
-                zipf.write(file_path, arcname)
+    with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED, compresslevel=1) as zipf:
+        zipf.writestr(zip_entry("dbt_project.yml"), DBT_PROJECT_YML, compresslevel=1)
+        zipf.writestr(zip_entry(f"models/{safe_filename}.sql"), combined_sql, compresslevel=1)
 
     return zip_path, zip_filename
 
@@ -277,9 +450,12 @@ def index():
         return jsonify({"error": "UI file not found"}), 404
 
 @app.route("/convert", methods=["POST"])
+# No streaming here: /convert_stream answers with the same JSON as /convert
+@app.route("/convert_stream", methods=["POST"])
 def convert():
     """Handle file upload, XML parsing, and dbt conversion."""
     print("Received request on /convert endpoint.")
+    save_raw = request.args.get('save_raw', '0') == '1'
     if 'file' not in request.files:
         return jsonify({"error": "No file part in the request"}), 400
     file = request.files['file']
@@ -289,7 +465,7 @@ def convert():
         return jsonify({"error": "Invalid file type. Upload '.item' or '.xml'."}), 400
 
     # File Handling
-    job_id = str(uuid.uuid4())
+    job_id = secrets.token_hex(16)
     safe_filename = secure_filename(os.path.splitext(file.filename)[0]) or "talend_job"
     xml_name = f"{job_id}_{safe_filename}.item"
     xml_path = os.path.join(UPLOAD_DIR, xml_name)
@@ -301,62 +477,77 @@ def convert():
     try:
         file.save(xml_path)
         print(f"Uploaded file saved to: {xml_path}")
-
-        with open(xml_path, "r", encoding="utf-8", errors="replace") as f:
-            xml_content = f.read()
-        if not xml_content:
+        if not os.path.getsize(xml_path):
             return jsonify({"error": "XML file is empty", "job_id": job_id}), 400
 
-        # Parse XML
-        talend_summary = extract_metadata_map(xml_path) #parse_talend_xml(xml_content)
+        # Parse XML from the saved bytes; no decoded copy is kept in memory
+        talend_summary = extract_metadata_map(xml_path)
         if "error" in talend_summary:
             return jsonify({"error": talend_summary["error"], "job_id": job_id}), 500
 
-        # Create LLM Prompt
-        prompt = f"""
+        # Create LLM Prompts, one per batch of components
+        components = talend_summary.get("components", [])
+        batches = [components[i:i + COMPONENT_BATCH_SIZE]
+                   for i in range(0, len(components), COMPONENT_BATCH_SIZE)] or [[]]
+        prompts = []
+        for batch_no, batch in enumerate(batches):
+            first_index = batch_no * COMPONENT_BATCH_SIZE + 1
+            batch_summary = {k: v for k, v in talend_summary.items() if k != "components"}
+            batch_summary["components"] = [
+                {"model_index": first_index + i, **component} for i, component in enumerate(batch)
+            ]
+            # The zip ships DBT_PROJECT_YML, so the model never writes its own
+            project_instruction = "Do not generate a `dbt_project.yml` file; it is generated separately."
+            scope_note = (
+                f"The json lists the whole job's connections but only components "
+                f"{first_index} to {first_index + len(batch) - 1} of {len(components)}.\n"
+            ) if len(batches) > 1 else ""
+            prompts.append(f"""
 you are an expert data engineer who is excel at migrating talend to DBT from json. parsed json into corresponding dbt models (SQL and YAML configuration). Use the parsed json if available, otherwise analyze the raw XML.
-jsonfile:
+{scope_note}jsonfile:
 ```json
-{json.dumps(talend_summary, indent=4)}
+{orjson.dumps(batch_summary, option=orjson.OPT_INDENT_2).decode()}
 ```
 **Instructions:**
-1. Generate dbt SQL models (.sql files) based on the Talend job logic.
-2. Include a `dbt_project.yml` configuration file.
+1. Generate dbt SQL models (.sql files) for the listed components based on the Talend job logic.
+2. {project_instruction}
 3. Provide detailed comments in the SQL files.
 4. Handle All transformation components like tMap ,tFilterRow ,tAggregateRow ,tDenormalize ,tNormalize ,tJoin ,tUniqRow ,tReplace ,tConvertType ,tSortRow ,tHashInput ,tHashOutput ,tPivotToColumnsDelimited ,tXMLMap ,tJavaRow etc.. by converting mappings to SQL transformations.Additional components like `tAggregateRow`, `tSortRow`, and others must be implemented similarly as SQL transformations.
-5. Return SQL code blocks marked by ```sql\n...\n```.
-"""
-        # Call LLM
-        dbt_content = call_generative_model(prompt)
-        if dbt_content.startswith("-- ERROR"):
-            return jsonify({"error": dbt_content, "job_id": job_id}), 500
-
-        # Save Raw Output
-        with open(raw_filepath, "w", encoding="utf-8") as f:
-            f.write(dbt_content)
+5. Precede each model with a line `<<<MODEL i>>>`, where i is the `model_index` of the component it is built from, followed by its SQL code block marked by ```sql\n...\n```.
+""")
 
-        # Extract SQL Blocks
-        sql_blocks = re.findall(r"```(?:sql)?\n(.*?)\n```", dbt_content, flags=re.DOTALL)
-        if not sql_blocks:
-            sql_blocks = [dbt_content]
-
-        # Save SQL File
-        with open(sql_path, "w", encoding="utf-8") as f:
-            for i, block in enumerate(sql_blocks, start=1):
-                f.write(f"-- dbt model #{i}\n{block.strip()}\n\n")
-
-        # Create dbt Project ZIP
-        zip_path, zip_filename = create_dbt_project_files(job_id, safe_filename, dbt_content)
+        # Call LLM
+        responses = call_generative_model_batches(prompts)
+        failed = next((r for r in responses if r.startswith("-- ERROR")), None)
+        if failed:
+            return jsonify({"error": failed, "job_id": job_id}), 500
+        dbt_content = "\n\n".join(responses)
+
+        # Extract SQL Blocks per response so an unclosed fence cannot pair across batches
+        sql_blocks = [block for text in responses for block in extract_sql_blocks(text)]
+
+        # Save the SQL file, the dbt project ZIP and (on request) the raw output in parallel
+        writes = [
+            IO_EXECUTOR.submit(create_dbt_project_files, job_id, safe_filename, sql_blocks),
+            IO_EXECUTOR.submit(write_sql_models, sql_path, sql_blocks),
+        ]
+        if save_raw:
+            writes.append(IO_EXECUTOR.submit(write_text_file, raw_filepath, dbt_content))
+        zip_path, zip_filename = writes[0].result()
+        for future in writes[1:]:
+            future.result()
 
         host_url = request.host_url.rstrip("/")
+        files = {
+            "sql": f"{host_url}/download/{sql_filename}",
+            "dbt_project_zip": f"{host_url}/download/{zip_filename}"
+        }
+        if save_raw:
+            files = {"raw_txt": f"{host_url}/download/{raw_filename}", **files}
         return jsonify({
             "job_id": job_id,
             "raw_output": dbt_content,
-            "files": {
-                "raw_txt": f"{host_url}/download/{raw_filename}",
-                "sql": f"{host_url}/download/{sql_filename}",
-                "dbt_project_zip": f"{host_url}/download/{zip_filename}"
-            }
+            "files": files
         }), 200
 
     except Exception as e:
@@ -384,15 +575,15 @@ Raw Output:
 3. Ensure dbt compatibility with proper syntax.
 4. Return the SQL content as plain text.
 """
-        sql_text = call_generative_model(prompt)
+        sql_text = cached_call_generative_model(prompt)
         if sql_text.startswith("-- ERROR"):
             return jsonify({"error": sql_text}), 500
 
-        job_id = data.get('job_id', str(uuid.uuid4()))
+        # The commented SQL file is the deliverable of this endpoint, so it is always written
+        job_id = data.get('job_id') or secrets.token_hex(16)
         commented_fn = f"{job_id}_commented.sql"
         commented_path = os.path.join(RESULTS_DIR, commented_fn)
-        with open(commented_path, "w", encoding="utf-8") as f:
-            f.write(sql_text)
+        write_text_file(commented_path, sql_text)
 
         host_url = request.host_url.rstrip("/")
         return jsonify({